@@ -3,10 +3,11 @@
 Script to update the prompt_template and condition in prompt_config.json with content from template.txt and condition.txt
 """
 
-import json
 import os
 from pathlib import Path
 
+import orjson
+
 
 def update_prompt_config():
     # Define paths relative to the script location
@@ -19,8 +20,7 @@ def update_prompt_config():
 
     # Read template content
     try:
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read().strip()
+        template_content = template_path.read_text(encoding='utf-8').strip()
     except FileNotFoundError:
         print(f"Error: Template file not found at {template_path}")
         return False
@@ -30,8 +30,7 @@ def update_prompt_config():
 
     # Read condition content
     try:
-        with open(condition_path, 'r', encoding='utf-8') as f:
-            condition_content = f.read().strip()
+        condition_content = condition_path.read_text(encoding='utf-8').strip()
     except FileNotFoundError:
         print(f"Error: Condition file not found at {condition_path}")
         return False
@@ -41,12 +40,11 @@ def update_prompt_config():
 
     # Read current config
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = orjson.loads(config_path.read_bytes())
     except FileNotFoundError:
         print(f"Error: Config file not found at {config_path}")
         return False
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"Error parsing config JSON: {e}")
         return False
     except Exception as e:
@@ -59,8 +57,8 @@ def update_prompt_config():
 
     # Write updated config back
     try:
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        config_path.write_bytes(orjson.dumps(
+            config, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
         print(f"Successfully updated prompt_template in {config_path}")
         return True
     except Exception as e:
@@ -8,28 +8,89 @@ for later processing with Ollama.
 
 import sys
 import json
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, Iterator
 
+import numpy as np
 import pandas as pd
 
 # Handle imports based on how the script is run
 try:
     # Try relative import (when run as module)
-    from .utils.prompt_builder import write_prompts
+    from .utils.prompt_builder import PROMPT_INDEX_NAME, write_prompts
 except ImportError:
     # Fall back to absolute import (when run directly)
-    from utils.prompt_builder import write_prompts
+    from utils.prompt_builder import PROMPT_INDEX_NAME, write_prompts
 
 
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+# Only short labels (codes, names) are interned
+INTERN_MAX_LENGTH = 64
+
+
+@lru_cache(maxsize=None)
 def _normalize_key(s: str) -> str:
     return "".join(ch for ch in str(s).lower() if ch.isalnum())
 
 
-def read_excel_all(excel_path: Path) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+def _is_missing(v: Any) -> bool:
+    """Treat None, NaN and pandas/NumPy NA as missing."""
+    # None / float NaN cover almost every cell; skip pandas for them
+    if v is None:
+        return True
+    if isinstance(v, float):
+        return v != v
+    if isinstance(v, (str, bool, int)):
+        return False
+
+    # lists/tuples: missing when all elements are missing
+    if isinstance(v, (list, tuple)):
+        return all(_is_missing(x) for x in v)
+
+    # arrays: missing only if all elements are NA
+    if isinstance(v, np.ndarray):
+        return bool(pd.isna(v).all())
+
+    try:
+        return bool(pd.isna(v))
+    except (TypeError, ValueError):
+        return False
+
+
+def _hashable_set(values: List[Any]) -> set:
+    """Set of the hashable items in `values` (unhashable ones are skipped)."""
+    out = set()
+    for v in values:
+        try:
+            out.add(v)
+        except TypeError:
+            pass
+    return out
+
+
+def _categorize_repeated_strings(s: pd.Series) -> pd.Series:
+    """
+    Store a text column with many repeated values (municipalities, crime
+    types, ...) as a categorical whose labels are interned, so each distinct
+    string exists once no matter how many rows repeat it.
+    """
+    if len(s) == 0 or pd.api.types.infer_dtype(s, skipna=True) != "string":
+        return s
+    if s.nunique() / len(s) > CATEGORY_MAX_UNIQUE_RATIO:
+        return s
+    cat = s.astype("category")
+    return cat.cat.rename_categories(
+        [sys.intern(c) if len(c) < INTERN_MAX_LENGTH else c
+         for c in cat.cat.categories]
+    )
+
+
+def read_excel_frame(excel_path: Path) -> Tuple[pd.DataFrame, Dict[str, str]]:
     """
     Read the whole Excel file and return:
-      - a list of records (each record is a dict mapping original column name -> cleaned value)
+      - a DataFrame of cleaned values (object columns, one per original column)
       - a mapping normalized_column_key -> original column name (for lookups)
     Values:
       - strings are stripped
@@ -39,31 +100,67 @@ def read_excel_all(excel_path: Path) -> Tuple[List[Dict[str, Any]], Dict[str, st
     if not excel_path.exists():
         raise FileNotFoundError(f"File not found: {excel_path}")
 
-    df = pd.read_excel(excel_path)
+    # calamine parses the workbook as plain data (no styles or layout)
+    df = pd.read_excel(excel_path, engine="calamine")
 
     # mapping from normalized key -> original column name
     cols_map = {_normalize_key(c): c for c in df.columns}
 
-    # Convert pandas NA -> None
-    df = df.where(pd.notna(df), None)
+    # Clean each column once as a Series instead of dispatching per cell
+    cleaned: Dict[Any, pd.Series] = {}
+    for col in df.columns:
+        s = df[col]
+        missing = s.isna()
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime('%Y-%m-%dT%H:%M:%S')
+        elif pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s):
+            kind = pd.api.types.infer_dtype(s, skipna=True)
+            if kind == "string":
+                s = s.str.strip()
+            elif kind in ("mixed", "mixed-integer"):
+                # .str only accepts string columns; strip the str cells alone
+                s = s.map(lambda v: v.strip() if isinstance(v, str) else v)
+            # object columns other than pure strings may carry Timestamps
+            # next to other values (e.g. a free-form column with dates)
+            if kind != "string":
+                s = s.map(lambda v: v.isoformat()
+                          if isinstance(v, pd.Timestamp) else v)
+        # keep numeric / bool values, converted to python-native types
+        s = s.astype(object).where(~missing, None)
+        cleaned[col] = _categorize_repeated_strings(s)
+
+    return pd.DataFrame(cleaned, columns=df.columns), cols_map
+
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Materialize a DataFrame as a list of dicts by zipping its columns."""
+    cols = list(df.columns)
+    column_lists = []
+    for col in cols:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            # categorical NA comes back as NaN; records use None
+            s = s.astype(object).where(s.notna(), None)
+        column_lists.append(s.tolist())
+    return [dict(zip(cols, vals)) for vals in zip(*column_lists)]
+
+
+def iter_records(df: pd.DataFrame) -> Iterator[Dict[str, Any]]:
+    """Yield the rows of a DataFrame as dicts, one at a time."""
+    cols = list(df.columns)
+    for vals in df.itertuples(index=False, name=None):
+        yield dict(zip(cols, vals))
 
-    records: List[Dict[str, Any]] = []
-    for _, row in df.iterrows():
-        rec: Dict[str, Any] = {}
-        for col in df.columns:
-            val = row[col]
-            if val is None:
-                rec[col] = None
-            elif isinstance(val, pd.Timestamp):
-                rec[col] = val.isoformat()
-            elif isinstance(val, str):
-                rec[col] = val.strip()
-            else:
-                # keep numeric / bool / python-native types as-is
-                rec[col] = val
-        records.append(rec)
 
-    return records, cols_map
+def read_excel_all(excel_path: Path) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Read the whole Excel file and return:
+      - a list of records (each record is a dict mapping original column name -> cleaned value)
+      - a mapping normalized_column_key -> original column name (for lookups)
+    Values are cleaned as described in `read_excel_frame`.
+    """
+    df, cols_map = read_excel_frame(excel_path)
+    return frame_to_records(df), cols_map
 
 
 def dedupe_records_by_nuc(
@@ -85,6 +182,8 @@ def dedupe_records_by_nuc(
         raise KeyError(f"NUC column not found (normalized key: {norm})")
 
     grouped: Dict[Any, Dict[str, Any]] = {}
+    # values already aggregated into a list, per (NUC, column)
+    seen: Dict[Tuple[Any, str], set] = {}
 
     for rec in records:
         nuc_val = rec.get(nuc_col_name)
@@ -101,31 +200,6 @@ def dedupe_records_by_nuc(
         for col, new_val in rec.items():
             old_val = agg.get(col)
 
-            # treat pandas/NumPy NA as missing
-            def _is_missing(v: Any) -> bool:
-                # None is missing
-                if v is None:
-                    return True
-
-                # lists/tuples: missing when all elements are missing
-                if isinstance(v, (list, tuple)):
-                    return all(_is_missing(x) for x in v)
-
-                try:
-                    res = pd.isna(v)
-                except Exception:
-                    return False
-
-                # pd.isna can return array-like for sequences; consider missing
-                # only if all elements are NA
-                if hasattr(res, "all"):
-                    try:
-                        return bool(res.all())
-                    except Exception:
-                        return False
-
-                return bool(res)
-
             if _is_missing(new_val):
                 # nothing to add from a missing new value
                 continue
@@ -139,20 +213,76 @@ def dedupe_records_by_nuc(
             if old_val == new_val:
                 continue
 
-            # If old_val is already a list, append new_val if not present
+            # If old_val is already a list, append new_val if not present;
+            # membership goes through a set of the list's hashable values
             if isinstance(old_val, list):
-                if new_val not in old_val:
-                    old_val.append(new_val)
-                    agg[col] = old_val
+                values_seen = seen.get((key, col))
+                if values_seen is None:
+                    values_seen = _hashable_set(old_val)
+                    seen[(key, col)] = values_seen
+                try:
+                    if new_val in values_seen:
+                        continue
+                    values_seen.add(new_val)
+                except TypeError:
+                    # unhashable value: fall back to the list scan
+                    if new_val in old_val:
+                        continue
+                old_val.append(new_val)
+                agg[col] = old_val
                 continue
 
             # old_val is a scalar and different from new_val -> make a list
-            agg[col] = [old_val, new_val] if new_val != old_val else old_val
+            agg[col] = [old_val, new_val]
+            seen[(key, col)] = _hashable_set(agg[col])
 
     # Return list of aggregated records
     return list(grouped.values())
 
 
+def dedupe_frame_by_nuc(
+    df: pd.DataFrame, cols_map: Dict[str, str], nuc_key: str = "nuc"
+) -> pd.DataFrame:
+    """
+    DataFrame counterpart of `dedupe_records_by_nuc`, with the same rules.
+
+    Groups are built once from the NUC column (missing NUCs form their own
+    group) and each column is aggregated with vectorized drop_duplicates;
+    only groups holding several distinct values go through a list
+    aggregation. Groups keep the order of their first appearance.
+    """
+    norm = _normalize_key(nuc_key)
+    nuc_col_name = cols_map.get(norm)
+    if not nuc_col_name:
+        raise KeyError(f"NUC column not found (normalized key: {norm})")
+
+    # group codes follow first appearance, so code i is output row i
+    codes, _ = pd.factorize(df[nuc_col_name], use_na_sentinel=False)
+    first_rows = pd.Series(codes).drop_duplicates().index.to_numpy()
+    n_groups = len(first_rows)
+
+    aggregated: Dict[Any, np.ndarray] = {}
+    for col in df.columns:
+        if col == nuc_col_name:
+            aggregated[col] = df[col].to_numpy(dtype=object)[first_rows]
+            continue
+
+        # distinct non-missing (group, value) pairs, in record order
+        pairs = pd.DataFrame({"g": codes, "v": df[col].to_numpy(dtype=object)})
+        pairs = pairs[pairs["v"].notna()].drop_duplicates()
+
+        values = np.full(n_groups, None, dtype=object)
+        multi = pairs["g"].duplicated(keep=False).to_numpy()
+        single = pairs[~multi]
+        values[single["g"].to_numpy()] = single["v"].to_numpy()
+        if multi.any():
+            lists = pairs[multi].groupby("g", sort=False)["v"].agg(list)
+            values[lists.index.to_numpy()] = lists.to_numpy()
+        aggregated[col] = values
+
+    return pd.DataFrame(aggregated, columns=df.columns)
+
+
 def sanitize_records_for_json(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Recursively sanitize records to make them JSON-friendly.
 
@@ -188,6 +318,18 @@ def sanitize_records_for_json(records: List[Dict[str, Any]]) -> List[Dict[str, A
     return [{k: _sanitize_value(v) for k, v in rec.items()} for rec in records]
 
 
+def sanitize_frame_for_json(df: pd.DataFrame) -> pd.DataFrame:
+    """DataFrame counterpart of `sanitize_records_for_json`.
+
+    Casting to object turns numpy/pandas scalars into native Python values
+    column-wise, and a single `where` replaces every NA with None, so the
+    records built from the result are JSON-friendly without per-cell checks.
+    Aggregated list cells are left untouched (`notna` is True for them).
+    """
+    df = df.astype(object)
+    return df.where(df.notna(), None)
+
+
 def main():
     """Generate prompts from crime narration data."""
     # Fixed paths
@@ -197,8 +339,8 @@ def main():
     # unique_path = Path("./output/unique.json")
 
     try:
-        records, cols_map = read_excel_all(excel_path)
-        print(f"Read {len(records)} records from {excel_path}",
+        df, cols_map = read_excel_frame(excel_path)
+        print(f"Read {len(df)} records from {excel_path}",
               file=sys.stderr)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -208,10 +350,10 @@ def main():
 
     # Deduplicate records by NUC
     try:
-        deduped = dedupe_records_by_nuc(records, cols_map)
+        deduped = dedupe_frame_by_nuc(df, cols_map)
         print(
-            f"Deduplicated: {len(records)} -> {len(deduped)} records", file=sys.stderr)
-        records = deduped
+            f"Deduplicated: {len(df)} -> {len(deduped)} records", file=sys.stderr)
+        df = deduped
     except KeyError as e:
         print(f"Warning: {e}; skipping deduplication", file=sys.stderr)
 
@@ -228,12 +370,15 @@ def main():
 
     # Generate prompts
     try:
-        safe_records = sanitize_records_for_json(records)
+        # Records are produced one row at a time while the prompts are
+        # written, so no list[dict] copy of the dataset is ever held
+        df = sanitize_frame_for_json(df)
         written = write_prompts(
-            safe_records,
+            iter_records(df),
             config_path=config_path,
             output_dir=prompts_dir,
             nuc_column=nuc_col,
+            index_path=prompts_dir / PROMPT_INDEX_NAME,
         )
         print(
             f"Generated {len(written)} prompt files in {prompts_dir}", file=sys.stderr)
@@ -6,19 +6,42 @@ This script expects prompt files to already exist in the output/prompts director
 and processes them with Ollama, saving responses to output/responses.
 """
 
+import argparse
+import os
 import sys
 import json
-import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional
+
+import orjson
 
 # Handle imports based on how the script is run
 try:
     # Try relative import (when run as module)
-    from .utils.ollama_client import process_prompts_with_ollama, save_summary_report
+    from .utils.ollama_client import (
+        DEFAULT_EMBEDDING_MODEL,
+        DEFAULT_SEMANTIC_THRESHOLD,
+        iter_results,
+        process_prompts_with_ollama,
+        save_summary_report,
+    )
+    from .utils.prompt_builder import extract_condition, load_prompt_index
 except ImportError:
     # Fall back to absolute import (when run directly)
-    from utils.ollama_client import process_prompts_with_ollama, save_summary_report
+    from utils.ollama_client import (
+        DEFAULT_EMBEDDING_MODEL,
+        DEFAULT_SEMANTIC_THRESHOLD,
+        iter_results,
+        process_prompts_with_ollama,
+        save_summary_report,
+    )
+    from utils.prompt_builder import extract_condition, load_prompt_index
+
+
+# Delimiters of the prompt sections read back by extract_original_values_from_prompt
+_JSON_FENCE = '```json'
+_FENCE_CLOSE = '\n```'
 
 
 def extract_original_values_from_prompt(prompt_content: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
@@ -32,14 +55,26 @@ def extract_original_values_from_prompt(prompt_content: str) -> Tuple[Optional[s
         Tuple of (nuc, condition, hechos) extracted from the JSON data in the prompt
     """
     try:
-        # Find the JSON block in the prompt (between ```json and ```)
-        json_match = re.search(r'```json\s*\n(.*?)\n```',
-                               prompt_content, re.DOTALL)
-        if not json_match:
+        # Find the JSON block in the prompt (between ```json and ```).
+        # The delimiters are literals, so plain str.find scans replace the
+        # DOTALL regex: the body starts after the newline that ends the
+        # whitespace following the fence and stops at the next closing fence.
+        fence_pos = prompt_content.find(_JSON_FENCE)
+        if fence_pos < 0:
+            return None, None, None
+        after_fence = fence_pos + len(_JSON_FENCE)
+        body_pos = after_fence
+        while body_pos < len(prompt_content) and prompt_content[body_pos].isspace():
+            body_pos += 1
+        newline_pos = prompt_content.rfind('\n', after_fence, body_pos)
+        if newline_pos < 0:
+            return None, None, None
+        end_pos = prompt_content.find(_FENCE_CLOSE, newline_pos + 1)
+        if end_pos < 0:
             return None, None, None
 
         # Parse the JSON data
-        record_data = json.loads(json_match.group(1))
+        record_data = json.loads(prompt_content[newline_pos + 1:end_pos])
 
         # Extract NUC (case identifier) - try common field names
         nuc = None
@@ -49,10 +84,7 @@ def extract_original_values_from_prompt(prompt_content: str) -> Tuple[Optional[s
                 break
 
         # Extract condition from the prompt text
-        condition_match = re.search(
-            r'Condición:\s*(.+?)(?=\n\n|\nDatos|\nResponde)', prompt_content, re.DOTALL)
-        condition = condition_match.group(
-            1).strip() if condition_match else None
+        condition = extract_condition(prompt_content)
 
         # Extract Hechos from the JSON data
         hechos = None
@@ -67,92 +99,152 @@ def extract_original_values_from_prompt(prompt_content: str) -> Tuple[Optional[s
         return None, None, None
 
 
-def preserve_original_values(results: list, prompts_dir: Path, responses_dir: Path) -> list:
+def _preserve_one(
+    result: Dict[str, Any],
+    prompts_dir: Path,
+    responses_dir: Path,
+    prompt_index: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]]
+) -> List[str]:
+    """
+    Merge the original values of one prompt into `result` in place and
+    re-save the response file. Values come from the prompt index, or from
+    the prompt file when it is not indexed. Returns the log lines for this
+    prompt so the caller can print them together.
+    """
+    prompt_file = result['prompt_file']
+    messages = []
+
+    try:
+        original_values = prompt_index.get(prompt_file)
+        if original_values is None:
+            # Read the original prompt file
+            prompt_content = (prompts_dir / prompt_file).read_text(encoding='utf-8')
+            original_values = extract_original_values_from_prompt(
+                prompt_content)
+        original_nuc, original_condition, original_hechos = original_values
+
+        # Debug output
+        if original_nuc:
+            messages.append(f"  📋 Extracted NUC: {original_nuc}")
+        if original_condition:
+            messages.append(
+                f"  📋 Extracted condition: {original_condition[:50]}...")
+        if original_hechos:
+            messages.append(f"  📋 Extracted hechos: {original_hechos[:50]}...")
+
+        # Get the LLM response
+        llm_response = result.get('response', {})
+
+        # Always add original values to ensure they're present
+        if original_nuc:
+            llm_response['nuc'] = original_nuc
+            messages.append(f"  ✓ Added NUC: {original_nuc}")
+
+        if original_condition:
+            llm_response['condition'] = original_condition
+            messages.append(f"  ✓ Added condition")
+
+        if original_hechos:
+            llm_response['hechos'] = original_hechos
+            messages.append(f"  ✓ Added hechos")
+
+        # Re-save the updated result to the response file
+        response_filename = prompt_file.replace('.md', '_response.json')
+        response_path = responses_dir / response_filename
+        response_path.write_bytes(orjson.dumps(
+            result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        messages.append(f"  ✓ Updated response file: {response_filename}")
+
+    except Exception as e:
+        messages.append(
+            f"  ⚠️  Warning: Could not preserve original values for {prompt_file}: {e}")
+
+    return messages
+
+
+def preserve_original_values(
+    results: list,
+    prompts_dir: Path,
+    responses_dir: Path,
+    max_workers: int = 16,
+    prompt_index: Optional[Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]]] = None
+) -> list:
     """
     Preserve original NUC and condition values in the results by extracting them
     from the original prompt files and merging them into the LLM responses.
     Also re-saves the individual response files with the updated data.
 
+    Each prompt is independent, so the read/extract/write work runs on a
+    thread pool; the GIL is released while the threads wait on disk I/O.
+
     Args:
         results: List of result dictionaries from Ollama processing
         prompts_dir: Directory containing the original prompt files
         responses_dir: Directory containing the response files
+        max_workers: Number of threads used for the file work
+        prompt_index: Optional {prompt filename: (nuc, condition, hechos)} mapping;
+                      when None it is loaded from prompts_dir
 
     Returns:
         Updated results with preserved original values
     """
-    updated_results = []
-
-    for result in results:
-        if not result.get('success', False):
-            # For failed results, just pass through
-            updated_results.append(result)
-            continue
-
-        prompt_file = result.get('prompt_file')
-        if not prompt_file:
-            updated_results.append(result)
-            continue
-
-        # Read the original prompt file
-        prompt_path = prompts_dir / prompt_file
-        try:
-            prompt_content = prompt_path.read_text(encoding='utf-8')
-            original_nuc, original_condition, original_hechos = extract_original_values_from_prompt(
-                prompt_content)
-
-            # Debug output
-            if original_nuc:
-                print(f"  📋 Extracted NUC: {original_nuc}")
-            if original_condition:
-                print(f"  📋 Extracted condition: {original_condition[:50]}...")
-            if original_hechos:
-                print(f"  📋 Extracted hechos: {original_hechos[:50]}...")
-
-            # Get the LLM response
-            llm_response = result.get('response', {})
-
-            # Always add original values to ensure they're present
-            if original_nuc:
-                llm_response['nuc'] = original_nuc
-                print(f"  ✓ Added NUC: {original_nuc}")
-
-            if original_condition:
-                llm_response['condition'] = original_condition
-                print(f"  ✓ Added condition")
-
-            if original_hechos:
-                llm_response['hechos'] = original_hechos
-                print(f"  ✓ Added hechos")
-
-            # Re-save the updated result to the response file
-            response_filename = prompt_file.replace('.md', '_response.json')
-            response_path = responses_dir / response_filename
-            with response_path.open('w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
-            print(f"  ✓ Updated response file: {response_filename}")
-
-        except Exception as e:
-            print(
-                f"  ⚠️  Warning: Could not preserve original values for {prompt_file}: {e}")
-
-        updated_results.append(result)
-
-    return updated_results
+    if prompt_index is None:
+        prompt_index = load_prompt_index(prompts_dir)
+
+    # Failed results and results without a prompt file are passed through
+    pending = [r for r in results
+               if r.get('success', False) and r.get('prompt_file')]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_preserve_one, result, prompts_dir,
+                                   responses_dir, prompt_index)
+                   for result in pending]
+        for future in as_completed(futures):
+            for message in future.result():
+                print(message)
+
+    # Results are updated in place, so the original order is kept
+    return list(results)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Process existing prompts with Ollama.")
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Always ask the model, ignoring and not updating the response "
+             "cache in output/responses/.cache")
+    parser.add_argument(
+        "--semantic-cache", action="store_true",
+        help="Reuse the answer of an already processed record whose embedding "
+             "is similar enough, instead of calling the model")
+    parser.add_argument(
+        "--semantic-threshold", type=float, default=DEFAULT_SEMANTIC_THRESHOLD,
+        help=f"Minimum cosine similarity for a semantic cache hit "
+             f"(default: {DEFAULT_SEMANTIC_THRESHOLD})")
+    parser.add_argument(
+        "--embedding-model", default=DEFAULT_EMBEDDING_MODEL,
+        help=f"Ollama model used to embed records (default: {DEFAULT_EMBEDDING_MODEL})")
+    parser.add_argument(
+        "--debug", action="store_true",
+        help="Keep the unparsed model output (raw_content) in each response file")
+    return parser.parse_args()
 
 
 def main():
     """Process existing prompts with Ollama."""
+    args = parse_args()
+
     # Fixed paths
     prompts_dir = Path("./output/prompts")
     responses_dir = Path("./output/responses")
     summary_path = Path("./output/ollama_summary.json")
+    results_path = Path("./output/ollama_results.ndjson")
     config_path = Path("./prompt/prompt_config.json")
 
     # Load config
     try:
-        with config_path.open("r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = orjson.loads(config_path.read_bytes())
         model = config.get("model", "gpt-oss:latest")
         use_json_format = config.get("use_json_format", False)
     except Exception as e:
@@ -169,7 +261,11 @@ def main():
             "Please run generate_prompts.py first to create prompt files.", file=sys.stderr)
         sys.exit(1)
 
-    prompt_files = list(prompts_dir.glob("*.md"))
+    # One directory read per folder: prompt names from the prompts folder and
+    # the set of existing responses, instead of a stat per expected response
+    with os.scandir(prompts_dir) as entries:
+        prompt_files = [Path(entry.path) for entry in entries
+                        if entry.name.endswith('.md')]
     if not prompt_files:
         print(
             f"Error: No prompt files found in {prompts_dir}", file=sys.stderr)
@@ -177,16 +273,21 @@ def main():
             "Please run generate_prompts.py first to create prompt files.", file=sys.stderr)
         sys.exit(1)
 
+    existing_responses = set()
+    if responses_dir.is_dir():
+        with os.scandir(responses_dir) as entries:
+            existing_responses = {entry.name for entry in entries
+                                  if entry.name.endswith('_response.json')}
+
     # Filter out prompts that already have responses
     prompts_to_process = []
     skipped_count = 0
 
     for prompt_file in prompt_files:
         # Construct expected response filename
-        response_filename = prompt_file.name.replace('.md', '_response.json')
-        response_path = responses_dir / response_filename
+        response_filename = prompt_file.stem + '_response.json'
 
-        if response_path.exists():
+        if response_filename in existing_responses:
             print(
                 f"Skipping {prompt_file.name} (response already exists)", file=sys.stderr)
             skipped_count += 1
@@ -204,6 +305,15 @@ def main():
     print(
         f"Processing {len(prompts_to_process)} remaining prompts", file=sys.stderr)
 
+    # Values recorded when the prompts were generated, so that responses can
+    # be completed without parsing every prompt file back
+    try:
+        prompt_index = load_prompt_index(prompts_dir)
+    except Exception as e:
+        print(
+            f"Warning: Could not load prompt index: {e}", file=sys.stderr)
+        prompt_index = {}
+
     try:
         print(
             f"Starting Ollama processing with model: {model}", file=sys.stderr)
@@ -212,24 +322,35 @@ def main():
                 "Using JSON format enforcement (may cause issues with some models)", file=sys.stderr)
         print("Note: Processing may take several minutes depending on the number of prompts", file=sys.stderr)
 
-        results = process_prompts_with_ollama(
+        process_prompts_with_ollama(
             prompts_dir=prompts_dir,
             responses_dir=responses_dir,
             model=model,
-            delay_between_requests=1.0,  # 1 second delay between requests
+            delay_between_requests=1.0,  # each request slot pauses 1 second between requests
             use_json_format=use_json_format,
-            prompt_files=prompts_to_process
+            prompt_files=prompts_to_process,
+            prompt_index=prompt_index,
+            enable_cache=not args.no_cache,
+            semantic_cache=args.semantic_cache,
+            semantic_threshold=args.semantic_threshold,
+            embedding_model=args.embedding_model,
+            results_path=results_path,
+            store_raw=args.debug
         )
 
         # Preserve original NUC and condition values (now handled automatically in processing)
         print("Original values preserved during processing...", file=sys.stderr)
 
-        # Save summary report
-        save_summary_report(results, summary_path)
+        # Save summary report, streaming the results back from the NDJSON file
+        save_summary_report(
+            iter_results(results_path), summary_path,
+            semantic_threshold=args.semantic_threshold if args.semantic_cache else None,
+            results_path=results_path)
 
         print("Ollama processing completed successfully!", file=sys.stderr)
         print(f"Results saved to {responses_dir}", file=sys.stderr)
         print(f"Summary report saved to {summary_path}", file=sys.stderr)
+        print(f"Detailed results saved to {results_path}", file=sys.stderr)
 
     except Exception as e:
         print(f"Error processing prompts with Ollama: {e}", file=sys.stderr)
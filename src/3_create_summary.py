@@ -1,6 +1,26 @@
 import os
-import json
+from pathlib import Path
+
+import orjson
 import pandas as pd
+import xlsxwriter
+
+try:
+    # Importación relativa (al ejecutarse como módulo)
+    from .utils.prompt_builder import extract_condition, load_prompt_index
+except ImportError:
+    # Importación absoluta (al ejecutarse directamente)
+    from utils.prompt_builder import extract_condition, load_prompt_index
+
+# Tipos de las columnas del resumen; meets_condition y confidence mezclan
+# valores del LLM con '' y se quedan como object
+COLUMN_DTYPES = {
+    'nuc': 'string',
+    'condition': 'string',
+    'rationale_short': 'string',
+    'hechos': 'string',
+    'ollama_success': 'int8',
+}
 
 
 def extract_condition_from_prompt(prompt_file_path):
@@ -8,15 +28,35 @@ def extract_condition_from_prompt(prompt_file_path):
     try:
         with open(prompt_file_path, 'r', encoding='utf-8') as f:
             content = f.read()
-            # Buscar la línea que contiene "Condición:"
-            for line in content.split('\n'):
-                if line.startswith('Condición:'):
-                    return line.replace('Condición:', '').strip()
+        # Mismo bloque de condición que guarda el índice de prompts
+        return extract_condition(content) or ""
     except Exception as e:
         print(f"Error leyendo {prompt_file_path}: {e}")
     return ""
 
 
+def write_excel_streaming(df, output_file):
+    """Escribe el DataFrame fila por fila con xlsxwriter en modo constant_memory.
+
+    En ese modo cada fila se vacía a disco al pasar a la siguiente, por lo
+    que las celdas deben escribirse en orden de fila; pandas las escribe por
+    columna, así que aquí se recorren las filas directamente.
+    """
+    # NA de pandas -> None (xlsxwriter deja la celda vacía)
+    df = df.astype(object)
+    df = df.where(df.notna(), None)
+
+    workbook = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    try:
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, list(df.columns),
+                            workbook.add_format({'bold': True}))
+        for row_idx, row in enumerate(df.itertuples(index=False, name=None), 1):
+            worksheet.write_row(row_idx, 0, row)
+    finally:
+        workbook.close()
+
+
 def main():
     responses_dir = 'output/responses'
     prompts_dir = 'output/prompts'
@@ -25,15 +65,34 @@ def main():
     # Crear directorio si no existe
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
-    data = []
+    # Valores guardados al generar los prompts; evitan releer el prompt de
+    # cada respuesta fallida
+    try:
+        prompt_index = load_prompt_index(Path(prompts_dir))
+    except Exception as e:
+        print(f"Advertencia: no se pudo leer el índice de prompts: {e}")
+        prompt_index = {}
+
+    # Columnas del resumen, acumuladas como listas independientes
+    columns = {
+        'nuc': [],
+        'condition': [],
+        'meets_condition': [],
+        'confidence': [],
+        'rationale_short': [],
+        'hechos': [],
+        'ollama_success': [],
+    }
 
     # Iterar sobre todos los archivos JSON en responses
-    for filename in os.listdir(responses_dir):
-        if filename.endswith('_response.json'):
-            filepath = os.path.join(responses_dir, filename)
+    with os.scandir(responses_dir) as entries:
+        for entry in entries:
+            filename = entry.name
+            if not filename.endswith('_response.json'):
+                continue
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    response_data = json.load(f)
+                with open(entry.path, 'rb') as f:
+                    response_data = orjson.loads(f.read())
 
                 success = response_data.get('success', False)
                 prompt_file = response_data.get('prompt_file', '')
@@ -49,34 +108,36 @@ def main():
                     hechos = resp.get('hechos', '')
                     ollama_success = 1
                 else:
-                    # Extraer nuc del nombre del archivo
+                    indexed_nuc, condition, _ = prompt_index.get(
+                        prompt_file, (None, None, None))
+                    # Sin índice: extraer nuc del nombre del archivo
                     # prompt_XXXXX_response.json -> XXXXX
-                    nuc = filename.split('_')[1]
-                    # Extraer condition del prompt
-                    prompt_path = os.path.join(prompts_dir, prompt_file)
-                    condition = extract_condition_from_prompt(prompt_path)
+                    nuc = indexed_nuc or filename.split('_')[1]
+                    if condition is None:
+                        # Extraer condition del prompt
+                        prompt_path = os.path.join(prompts_dir, prompt_file)
+                        condition = extract_condition_from_prompt(prompt_path)
                     meets_condition = ''
                     confidence = ''
                     rationale_short = ''
                     hechos = ''
                     ollama_success = 0
 
-                data.append({
-                    'nuc': nuc,
-                    'condition': condition,
-                    'meets_condition': meets_condition,
-                    'confidence': confidence,
-                    'rationale_short': rationale_short,
-                    'hechos': hechos,
-                    'ollama_success': ollama_success
-                })
+                row = (nuc, condition, meets_condition, confidence,
+                       rationale_short, hechos, ollama_success)
+                for values, value in zip(columns.values(), row):
+                    values.append(value)
 
             except Exception as e:
                 print(f"Error procesando {filename}: {e}")
 
-    # Crear DataFrame y escribir a Excel
-    df = pd.DataFrame(data)
-    df.to_excel(output_file, index=False)
+    # Crear DataFrame con tipos explícitos (sin inferencia) y escribir a Excel
+    df = pd.DataFrame(
+        {name: pd.array(values, dtype=COLUMN_DTYPES.get(name, object))
+         for name, values in columns.items()},
+        copy=False,
+    )
+    write_excel_streaming(df, output_file)
     print(f"Resumen escrito en {output_file}")
 
 
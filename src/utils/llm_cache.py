@@ -0,0 +1,210 @@
+"""
+File-based caches of LLM responses: exact (model + prompt hash) and
+semantic (embedding similarity).
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+
+class LLMCache:
+    """
+    Exact-match response cache stored as one JSON file per key.
+
+    Entries hold the parsed response and the raw content returned by the
+    model. Hits and misses are counted for the lifetime of the instance;
+    `get` may be called from several threads at once.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(model: str, prompt: str, use_json_format: bool = False) -> str:
+        """Deterministic key for a request: sha256 of its sorted JSON form."""
+        payload = json.dumps(
+            {'model': model, 'prompt': prompt, 'use_json_format': use_json_format},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for `key`, or None on a miss."""
+        try:
+            entry = orjson.loads(self._path(key).read_bytes())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            with self._counter_lock:
+                self.misses += 1
+            return None
+        with self._counter_lock:
+            self.hits += 1
+        return entry
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        """Store `entry` under `key`; the file is replaced atomically."""
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS))
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0
+        }
+
+
+class SemanticCache:
+    """
+    Near-duplicate response cache keyed on prompt embeddings.
+
+    Embeddings are kept L2-normalized in one stacked matrix, so a lookup is a
+    single matrix-vector product; the closest entry is returned when its
+    cosine similarity reaches `threshold`. Entries are persisted to
+    `cache_dir` by `save`.
+    """
+
+    def __init__(self, cache_dir: Path, threshold: float = 0.92):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: List[Dict[str, Any]] = []
+        # Preallocated rows; only the first len(self._entries) are in use
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._load()
+
+    @property
+    def _embeddings_path(self) -> Path:
+        return self.cache_dir / "embeddings.npy"
+
+    @property
+    def _entries_path(self) -> Path:
+        return self.cache_dir / "entries.json"
+
+    def _load(self) -> None:
+        if not (self._embeddings_path.exists() and self._entries_path.exists()):
+            return
+        matrix = np.load(self._embeddings_path)
+        entries = orjson.loads(self._entries_path.read_bytes())
+        if len(entries) != len(matrix):
+            # Interrupted save; start over rather than mismatch entries
+            return
+        self._matrix = matrix.astype(np.float32, copy=False)
+        self._entries = entries
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return (entry, similarity) for the closest entry above the threshold."""
+        vector = self._normalize(embedding)
+        count = len(self._entries)
+        if count == 0 or self._matrix.shape[1] != vector.shape[0]:
+            self.misses += 1
+            return None
+        similarities = self._matrix[:count] @ vector
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._entries[best], similarity
+
+    def add(self, embedding, entry: Dict[str, Any]) -> None:
+        vector = self._normalize(embedding)
+        count = len(self._entries)
+        if count and self._matrix.shape[1] != vector.shape[0]:
+            # A different embedding model was used; keep only one dimension
+            return
+        if count == len(self._matrix):
+            # Grow geometrically so adds stay amortized O(1)
+            grown = np.empty((max(16, 2 * count), vector.shape[0]),
+                             dtype=np.float32)
+            if count:
+                grown[:count] = self._matrix[:count]
+            self._matrix = grown
+        self._matrix[count] = vector
+        self._entries.append(entry)
+
+    def save(self) -> None:
+        count = len(self._entries)
+        np.save(self._embeddings_path, self._matrix[:count])
+        self._entries_path.write_bytes(
+            orjson.dumps(self._entries, option=orjson.OPT_NON_STR_KEYS))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0
+        }
+
+
+class SemanticCacheSet:
+    """
+    Semantic caches kept apart by namespace, one SemanticCache directory each.
+
+    Answers are only shared within a namespace. Callers derive it from
+    everything besides the record that shapes an answer (models, condition,
+    template), so a changed condition never replays answers made for the
+    old one.
+    """
+
+    def __init__(self, cache_dir: Path, threshold: float = 0.92):
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self._caches: Dict[str, SemanticCache] = {}
+
+    @staticmethod
+    def namespace(*parts: Any) -> str:
+        """Short deterministic name for the given parts."""
+        payload = json.dumps(list(parts), ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def get(self, namespace: str) -> SemanticCache:
+        """Return the cache of `namespace`, loading it on first use."""
+        cache = self._caches.get(namespace)
+        if cache is None:
+            cache = SemanticCache(self.cache_dir / namespace, self.threshold)
+            self._caches[namespace] = cache
+        return cache
+
+    def save(self) -> None:
+        for cache in self._caches.values():
+            cache.save()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(cache.hits for cache in self._caches.values())
+        misses = sum(cache.misses for cache in self._caches.values())
+        lookups = hits + misses
+        return {
+            'threshold': self.threshold,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0
+        }
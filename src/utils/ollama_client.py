@@ -1,15 +1,58 @@
 """
 Ollama client for sending prompts to language models.
 """
+import asyncio
+import hashlib
 import json
+import os
 import time
 import re
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Callable, Iterable, Iterator, Optional, List, Tuple
 
 # import ollama
-from ollama import chat
-from ollama import ChatResponse
+from ollama import AsyncClient, ChatResponse, Client
+import orjson
+
+try:
+    # RE2 (pip install google-re2) matches in linear time without
+    # backtracking; the standard library engine is used when it is missing
+    import re2 as _regex
+except ImportError:
+    _regex = re
+
+try:
+    # Try relative import (when imported as part of the package)
+    from .llm_cache import LLMCache, SemanticCacheSet
+    from .prompt_builder import HECHOS_FIELDS, NUC_FIELDS, extract_condition
+except ImportError:
+    # Fall back to absolute import (when utils is on sys.path)
+    from utils.llm_cache import LLMCache, SemanticCacheSet
+    from utils.prompt_builder import HECHOS_FIELDS, NUC_FIELDS, extract_condition
+
+
+# Concurrent requests when OLLAMA_NUM_PARALLEL is not set in the environment
+DEFAULT_CONCURRENCY = 4
+
+# Semantic cache defaults: Ollama's all-MiniLM-L6-v2 and the similarity a
+# cached answer must reach to be reused
+DEFAULT_EMBEDDING_MODEL = "all-minilm"
+DEFAULT_SEMANTIC_THRESHOLD = 0.92
+
+# One synchronous client for the whole process, so consecutive prompts reuse
+# its keep-alive connection pool. The async path creates one AsyncClient per
+# run and shares it between all concurrent prompts.
+_CLIENT = Client()
+
+# Indented output for the response files and the summary report
+_JSON_DUMP_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+# Patterns used on every response and prompt, compiled once at import.
+# They are written for both engines: DOTALL as an inline (?s) flag and no
+# lookarounds, which RE2 does not support. RE2's \w is ASCII-only, which is
+# all a fence language tag holds in practice.
+_JSON_BLOCK_RE = _regex.compile(r'(?s)```\w*\n(.*?)\n```')
+_PROMPT_JSON_RE = _regex.compile(r'(?s)```json\s*\n(.*?)\n```')
 
 
 def get_retry_reason(result: Dict[str, Any]) -> str:
@@ -97,8 +140,7 @@ def clean_json_response(raw_content: str) -> str:
     """
     # Remove markdown code blocks (```json ... ``` or ``` ... ```)
     # Pattern matches ```json or ``` followed by content until closing ```
-    json_block_pattern = re.compile(r'```\w*\n(.*?)\n```', re.DOTALL)
-    match = json_block_pattern.search(raw_content.strip())
+    match = _JSON_BLOCK_RE.search(raw_content.strip())
 
     if match:
         # Extract content from markdown block
@@ -121,17 +163,19 @@ def parse_llm_response(raw_content: str) -> Dict[str, Any]:
     Raises:
         ValueError: If response cannot be parsed as valid JSON
     """
-    # First try to parse as-is
-    try:
-        return json.loads(raw_content)
-    except json.JSONDecodeError:
-        pass
+    # First try to parse as-is, but only when the content can be bare JSON;
+    # fenced answers go straight to cleaning without a failed parse
+    if raw_content.lstrip().startswith(('{', '[')):
+        try:
+            return orjson.loads(raw_content)
+        except orjson.JSONDecodeError:
+            pass
 
     # If that fails, try cleaning markdown and parsing
     cleaned_content = clean_json_response(raw_content)
     try:
-        return json.loads(cleaned_content)
-    except json.JSONDecodeError as e:
+        return orjson.loads(cleaned_content)
+    except orjson.JSONDecodeError as e:
         # Include both original and cleaned content in error for debugging
         raise ValueError(
             f"Invalid JSON response: {e}. "
@@ -140,11 +184,95 @@ def parse_llm_response(raw_content: str) -> Dict[str, Any]:
         )
 
 
+def _chat_options(timeout: int, use_json_format: bool) -> Dict[str, Any]:
+    # Prepare Ollama options
+    options = {'timeout': timeout}
+
+    # Add format option if requested (may cause issues with some models)
+    if use_json_format:
+        options['format'] = 'json'
+    return options
+
+
+def _success_result(
+    model: str,
+    response: ChatResponse,
+    duration: float,
+    use_json_format: bool
+) -> Dict[str, Any]:
+    # Parse and validate the response as JSON using enhanced parsing
+    raw_content = response['message']['content']
+    try:
+        parsed_response = parse_llm_response(raw_content)
+    except ValueError as e:
+        # Re-raise with additional context
+        raise ValueError(f"Failed to parse LLM response: {e}")
+
+    return {
+        'success': True,
+        'model': model,
+        'response': parsed_response,  # Return parsed JSON instead of raw string
+        'duration_seconds': duration,
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'error': None,
+        'raw_content': raw_content,  # Dropped unless store_raw is set
+        'used_json_format': use_json_format,
+        'cached': False
+    }
+
+
+def _cached_result(model: str, entry: Dict[str, Any], use_json_format: bool) -> Dict[str, Any]:
+    return {
+        'success': True,
+        'model': model,
+        'response': entry['response'],
+        'duration_seconds': 0.0,
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'error': None,
+        'raw_content': entry.get('raw_content'),
+        'used_json_format': use_json_format,
+        'cached': True
+    }
+
+
+def _store_in_cache(cache: Optional[LLMCache], key: Optional[str], result: Dict[str, Any]) -> None:
+    # Only answers that would not be retried are worth replaying
+    if cache is None or should_retry_result(result):
+        return
+    cache.set(key, {
+        'response': result['response'],
+        'raw_content': result.get('raw_content')
+    })
+
+
+def _drop_raw_content(result: Dict[str, Any], store_raw: bool) -> Dict[str, Any]:
+    # The raw answer repeats the parsed response; keep it only for debugging
+    if not store_raw:
+        result.pop('raw_content', None)
+    return result
+
+
+def _error_result(model: str, error: Exception, use_json_format: bool) -> Dict[str, Any]:
+    return {
+        'success': False,
+        'model': model,
+        'response': None,
+        'duration_seconds': None,
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'error': str(error),
+        'raw_content': None,
+        'used_json_format': use_json_format
+    }
+
+
 def send_prompt_to_ollama(
     prompt: str,
     model: str = "gpt-oss:latest",
     timeout: int = 120,
-    use_json_format: bool = False
+    use_json_format: bool = False,
+    cache: Optional[LLMCache] = None,
+    client: Optional[Client] = None,
+    store_raw: bool = False
 ) -> Dict[str, Any]:
     """
     Send a prompt to Ollama and return the response.
@@ -157,22 +285,92 @@ def send_prompt_to_ollama(
                          Note: This may cause issues with some models like gpt-oss:latest.
                          Known working models: llama2:13b, codellama:13b
                          Known problematic models: gpt-oss:latest, some fine-tuned models
+        cache: Optional LLMCache. A cached answer for the same model and prompt
+               is returned without calling Ollama; new answers that would not
+               be retried are stored in it
+        client: Client to send the request with; defaults to the module-level
+                client, which keeps its connections open between calls
+        store_raw: Whether to keep the unparsed model output under
+                   'raw_content' (for debugging). The cache always stores it
 
     Returns:
         Dictionary containing the response and metadata
     """
+    key = None
+    if cache is not None:
+        key = LLMCache.cache_key(model, prompt, use_json_format)
+        entry = cache.get(key)
+        if entry is not None:
+            return _drop_raw_content(
+                _cached_result(model, entry, use_json_format), store_raw)
+
     try:
         start_time = time.time()
 
-        # Prepare Ollama options
-        options = {'timeout': timeout}
+        # Send the prompt to Ollama
+        response: ChatResponse = (client or _CLIENT).chat(
+            model=model,
+            messages=[
+                {
+                    'role': 'user',
+                    'content': prompt
+                }
+            ],
+            options=_chat_options(timeout, use_json_format)
+        )
+
+        result = _success_result(
+            model, response, time.time() - start_time, use_json_format)
+        _store_in_cache(cache, key, result)
+        return _drop_raw_content(result, store_raw)
 
-        # Add format option if requested (may cause issues with some models)
-        if use_json_format:
-            options['format'] = 'json'
+    except Exception as e:
+        return _drop_raw_content(
+            _error_result(model, e, use_json_format), store_raw)
+
+
+async def send_prompt_to_ollama_async(
+    prompt: str,
+    model: str = "gpt-oss:latest",
+    timeout: int = 120,
+    use_json_format: bool = False,
+    client: Optional[AsyncClient] = None,
+    cache: Optional[LLMCache] = None,
+    store_raw: bool = False
+) -> Dict[str, Any]:
+    """
+    Async counterpart of send_prompt_to_ollama; returns the same dictionary.
+
+    Args:
+        prompt: The prompt text to send
+        model: The model name to use
+        timeout: Timeout in seconds
+        use_json_format: Whether to force JSON format in Ollama options
+        client: AsyncClient to send the request with. Share one client across
+                concurrent calls so they reuse its connection pool.
+        cache: Optional LLMCache, as in send_prompt_to_ollama
+        store_raw: As in send_prompt_to_ollama
+
+    Returns:
+        Dictionary containing the response and metadata
+    """
+    key = None
+    if cache is not None:
+        key = LLMCache.cache_key(model, prompt, use_json_format)
+        # Cache entries are files; read them off the event loop thread
+        entry = await asyncio.to_thread(cache.get, key)
+        if entry is not None:
+            return _drop_raw_content(
+                _cached_result(model, entry, use_json_format), store_raw)
+
+    if client is None:
+        client = AsyncClient()
+
+    try:
+        start_time = time.time()
 
         # Send the prompt to Ollama
-        response: ChatResponse = chat(
+        response: ChatResponse = await client.chat(
             model=model,
             messages=[
                 {
@@ -180,42 +378,35 @@ def send_prompt_to_ollama(
                     'content': prompt
                 }
             ],
-            options=options
+            options=_chat_options(timeout, use_json_format)
         )
 
-        end_time = time.time()
-        duration = end_time - start_time
-
-        # Parse and validate the response as JSON using enhanced parsing
-        raw_content = response['message']['content']
-        try:
-            parsed_response = parse_llm_response(raw_content)
-        except ValueError as e:
-            # Re-raise with additional context
-            raise ValueError(f"Failed to parse LLM response: {e}")
-
-        return {
-            'success': True,
-            'model': model,
-            'response': parsed_response,  # Return parsed JSON instead of raw string
-            'duration_seconds': duration,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'error': None,
-            'raw_content': raw_content,  # Keep raw content for debugging
-            'used_json_format': use_json_format
-        }
+        result = _success_result(
+            model, response, time.time() - start_time, use_json_format)
+        await asyncio.to_thread(_store_in_cache, cache, key, result)
+        return _drop_raw_content(result, store_raw)
 
     except Exception as e:
-        return {
-            'success': False,
-            'model': model,
-            'response': None,
-            'duration_seconds': None,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'error': str(e),
-            'raw_content': None,
-            'used_json_format': use_json_format
-        }
+        return _drop_raw_content(
+            _error_result(model, e, use_json_format), store_raw)
+
+
+def extract_record_json(prompt_content: str) -> Optional[str]:
+    """Return the record JSON embedded in a prompt (its ```json block), or None."""
+    json_match = _PROMPT_JSON_RE.search(prompt_content)
+    return json_match.group(1) if json_match else None
+
+
+def template_fingerprint(prompt_content: str) -> str:
+    """
+    Hash of a prompt without its record JSON: the condition, output schema
+    and instructions the record is judged against.
+    """
+    json_match = _PROMPT_JSON_RE.search(prompt_content)
+    if json_match:
+        prompt_content = (prompt_content[:json_match.start(1)]
+                          + prompt_content[json_match.end(1):])
+    return hashlib.sha256(prompt_content.encode('utf-8')).hexdigest()
 
 
 def extract_original_values_from_prompt(prompt_content: str) -> tuple[Optional[str], Optional[str], Optional[str]]:
@@ -228,34 +419,28 @@ def extract_original_values_from_prompt(prompt_content: str) -> tuple[Optional[s
     Returns:
         Tuple of (nuc, condition, hechos) extracted from the JSON data in the prompt
     """
-    import re
-
     try:
         # Find the JSON block in the prompt (between ```json and ```)
-        json_match = re.search(r'```json\s*\n(.*?)\n```',
-                               prompt_content, re.DOTALL)
-        if not json_match:
+        record_json = extract_record_json(prompt_content)
+        if record_json is None:
             return None, None, None
 
         # Parse the JSON data
-        record_data = json.loads(json_match.group(1))
+        record_data = json.loads(record_json)
 
         # Extract NUC (case identifier) - try common field names
         nuc = None
-        for field in ['nuc', 'NUC', 'case_id', 'id', 'folio', 'numero_unico_caso']:
+        for field in NUC_FIELDS:
             if field in record_data and record_data[field] is not None:
                 nuc = str(record_data[field])
                 break
 
         # Extract condition from the prompt text
-        condition_match = re.search(
-            r'Condición:\s*(.+?)(?=\n\n|\nDatos|\nResponde)', prompt_content, re.DOTALL)
-        condition = condition_match.group(
-            1).strip() if condition_match else None
+        condition = extract_condition(prompt_content)
 
         # Extract Hechos from the JSON data
         hechos = None
-        for field in ['hechos', 'Hechos', 'HECHOS', 'narrativa', 'narracion', 'crime_narration']:
+        for field in HECHOS_FIELDS:
             if field in record_data and record_data[field] is not None:
                 hechos = str(record_data[field])
                 break
@@ -266,28 +451,391 @@ def extract_original_values_from_prompt(prompt_content: str) -> tuple[Optional[s
         return None, None, None
 
 
+def default_concurrency() -> int:
+    """
+    Number of prompts to keep in flight against the Ollama server.
+
+    Ollama serves up to OLLAMA_NUM_PARALLEL requests per loaded model at the
+    same time (and keeps up to OLLAMA_MAX_LOADED_MODELS models in memory);
+    requests beyond that are queued by the server. The client uses the same
+    OLLAMA_NUM_PARALLEL value when it is set in the environment.
+    """
+    try:
+        return max(1, int(os.environ.get('OLLAMA_NUM_PARALLEL', DEFAULT_CONCURRENCY)))
+    except ValueError:
+        return DEFAULT_CONCURRENCY
+
+
+async def _embed_record(
+    client: AsyncClient,
+    prompt_content: str,
+    embedding_model: str
+) -> Optional[List[float]]:
+    """Embed the record JSON of a prompt; the template and condition are shared by all prompts."""
+    record_json = extract_record_json(prompt_content)
+    if record_json is None:
+        return None
+    response = await client.embed(model=embedding_model, input=record_json)
+    return response['embeddings'][0]
+
+
+async def _request_with_retries(
+    client: AsyncClient,
+    prompt_content: str,
+    prompt_file: Path,
+    prompt_number: int,
+    tag: str,
+    model: str,
+    use_json_format: bool,
+    cache: Optional[LLMCache],
+    semantic_caches: Optional[SemanticCacheSet],
+    embedding_model: str,
+    request_slots: asyncio.Semaphore,
+    delay_between_requests: float,
+    store_raw: bool
+) -> Tuple[Dict[str, Any], int]:
+    """Get the answer to one prompt, retrying weak answers; returns (result, attempts)."""
+    # Initialize retry variables
+    max_retries = 3
+    attempt = 0
+    final_result = None
+
+    # Serve records that are near-duplicates of an answered one from the
+    # semantic cache, skipping the chat call entirely
+    embedding = None
+    semantic_cache = None
+    if semantic_caches is not None:
+        # Only records judged by the same models against the same prompt
+        # template (condition and schema included) share answers
+        semantic_cache = semantic_caches.get(SemanticCacheSet.namespace(
+            model, embedding_model, use_json_format,
+            template_fingerprint(prompt_content)))
+        try:
+            async with request_slots:
+                embedding = await _embed_record(
+                    client, prompt_content, embedding_model)
+        except Exception as e:
+            print(f"  {tag} ⚠️  Warning: Could not embed record: {e}")
+        if embedding is not None:
+            hit = semantic_cache.lookup(embedding)
+            if hit is not None:
+                entry, similarity = hit
+                final_result = _drop_raw_content(_cached_result(
+                    model, {**entry, 'response': dict(entry['response'])},
+                    use_json_format), store_raw)
+                final_result['semantic_similarity'] = similarity
+                attempt = 1
+                print(
+                    f"  {tag} ✓ Semantic cache hit (similarity {similarity:.3f})")
+
+    while final_result is None and attempt < max_retries:
+        attempt += 1
+        print(f"  {tag} Attempt {attempt}/{max_retries}")
+
+        try:
+            # Send to Ollama
+            async with request_slots:
+                result = await send_prompt_to_ollama_async(
+                    prompt_content,
+                    model,
+                    use_json_format=use_json_format,
+                    client=client,
+                    cache=cache,
+                    store_raw=store_raw
+                )
+                # Throttle: a slot stays taken for the delay after a request
+                # that reached Ollama (cached answers never did)
+                if not result.get('cached', False):
+                    await asyncio.sleep(delay_between_requests)
+
+            # Check if we need to retry
+            if should_retry_result(result):
+                if attempt < max_retries:
+                    retry_reason = get_retry_reason(result)
+                    print(
+                        f"  {tag} ⚠️  Retry needed (reason: {retry_reason}), waiting before retry...")
+                    await asyncio.sleep(2)  # Brief pause before retry
+                    continue
+                else:
+                    print(
+                        f"  {tag} ✗ Max retries ({max_retries}) reached, using final result")
+                    final_result = result
+                    break
+            else:
+                # Success - no retry needed
+                final_result = result
+                if attempt > 1:
+                    print(f"  {tag} ✓ Success on attempt {attempt}")
+                break
+
+        except Exception as e:
+            if attempt < max_retries:
+                print(
+                    f"  {tag} ✗ Attempt {attempt} failed: {e}, retrying...")
+                await asyncio.sleep(2)  # Brief pause before retry
+                continue
+            else:
+                print(
+                    f"  {tag} ✗ Max retries ({max_retries}) reached after exception: {e}")
+                final_result = {
+                    'success': False,
+                    'prompt_file': prompt_file.name,
+                    'prompt_number': prompt_number,
+                    'error': f"Failed after {max_retries} attempts: {str(e)}",
+                    'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'retry_attempts': attempt
+                }
+                break
+
+    # Use the final result (either successful or after max retries)
+    result = final_result
+
+    if (embedding is not None and not result.get('cached', False)
+            and not should_retry_result(result)):
+        # Copy before the original values are merged into the response
+        semantic_cache.add(embedding, {
+            'response': dict(result['response']),
+            'raw_content': result.get('raw_content')
+        })
+
+    return result, attempt
+
+
+async def _save_result(
+    result: Dict[str, Any],
+    attempt: int,
+    prompt_file: Path,
+    prompt_number: int,
+    tag: str,
+    prompt_content: str,
+    responses_dir: Path,
+    prompt_index: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]]
+) -> Path:
+    """Complete `result` with the prompt's file information and original values, and save it."""
+    # Add file information to result
+    result['prompt_file'] = prompt_file.name
+    result['prompt_number'] = prompt_number
+    result['retry_attempts'] = attempt
+
+    # Extract and add original NUC, condition, and hechos values immediately
+    if result.get('success', False):
+        try:
+            original_values = prompt_index.get(prompt_file.name)
+            if original_values is None:
+                original_values = extract_original_values_from_prompt(
+                    prompt_content)
+            original_nuc, original_condition, original_hechos = original_values
+            if original_nuc:
+                result['response']['nuc'] = original_nuc
+                print(f"  {tag} ✓ Added NUC: {original_nuc}")
+            if original_condition:
+                result['response']['condition'] = original_condition
+                print(f"  {tag} ✓ Added condition")
+            if original_hechos:
+                result['response']['hechos'] = original_hechos
+                print(f"  {tag} ✓ Added hechos")
+        except Exception as e:
+            print(
+                f"  {tag} ⚠️  Warning: Could not extract original values: {e}")
+
+    # Create response filename (replace .md with _response.json)
+    response_filename = prompt_file.stem + "_response.json"
+    response_path = responses_dir / response_filename
+
+    # Save the full result as JSON; the write runs in a worker thread so other
+    # prompts keep being scheduled meanwhile
+    await asyncio.to_thread(
+        response_path.write_bytes, orjson.dumps(result, option=_JSON_DUMP_OPTIONS))
+
+    print(f"  {tag} ✓ Response saved to: {response_filename}")
+
+    if result['success']:
+        if result.get('cached') and 'semantic_similarity' not in result:
+            print(f"  {tag} ✓ Served from response cache")
+        print(f"  {tag} ✓ Duration: {result['duration_seconds']:.2f}s")
+        if result.get('used_json_format'):
+            print(f"  {tag} ✓ Used JSON format enforcement")
+        if attempt > 1:
+            print(f"  {tag} ✓ Completed after {attempt} attempts")
+    else:
+        print(f"  {tag} ✗ Error: {result['error']}")
+
+    return response_path
+
+
+async def _process_prompt_file(
+    client: AsyncClient,
+    prompt_file: Path,
+    prompt_number: int,
+    total: int,
+    responses_dir: Path,
+    model: str,
+    use_json_format: bool,
+    prompt_index: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]],
+    cache: Optional[LLMCache],
+    semantic_caches: Optional[SemanticCacheSet],
+    embedding_model: str,
+    request_slots: asyncio.Semaphore,
+    dispatched: Dict[bytes, asyncio.Future],
+    delay_between_requests: float,
+    store_raw: bool
+) -> Dict[str, Any]:
+    """Send one prompt file (with retries), save its response and return the result.
+
+    A slot of `request_slots` is held while a request is in flight and for
+    the delay after it, but not during retry pauses, so a prompt waiting to
+    retry lets another prompt use the server.
+    Prompts whose content is byte-identical to one already in `dispatched`
+    reuse its saved response instead of being sent again.
+    """
+    tag = f"[{prompt_number}/{total}]"
+    print(f"Processing prompt {prompt_number}/{total}: {prompt_file.name}")
+
+    # Read the prompt once, off the event loop thread
+    prompt_content = await asyncio.to_thread(prompt_file.read_text, encoding='utf-8')
+
+    digest = hashlib.blake2b(
+        prompt_content.encode('utf-8'), digest_size=16).digest()
+    earlier = dispatched.get(digest)
+    if earlier is not None:
+        # Same prompt as an earlier file: wait until its response is saved
+        # and read it back
+        original_file, original_response = await earlier
+        result = orjson.loads(await asyncio.to_thread(original_response.read_bytes))
+        # Nothing was sent, retried or read from a cache for this file
+        result['duplicate_of'] = original_file
+        result['duration_seconds'] = 0.0
+        result['cached'] = False
+        result.pop('semantic_similarity', None)
+        print(f"  {tag} ✓ Same prompt as {original_file}, reusing its result")
+        await _save_result(result, 0, prompt_file, prompt_number, tag,
+                           prompt_content, responses_dir, prompt_index)
+        return result
+
+    future = asyncio.get_running_loop().create_future()
+    dispatched[digest] = future
+    try:
+        result, attempt = await _request_with_retries(
+            client, prompt_content, prompt_file, prompt_number, tag,
+            model, use_json_format, cache, semantic_caches,
+            embedding_model, request_slots, delay_between_requests,
+            store_raw)
+        response_path = await _save_result(
+            result, attempt, prompt_file, prompt_number, tag,
+            prompt_content, responses_dir, prompt_index)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    # Only the file name is kept for duplicates, not the result itself
+    future.set_result((prompt_file.name, response_path))
+    return result
+
+
+async def _process_prompts_async(
+    files_to_process: List[Path],
+    responses_dir: Path,
+    model: str,
+    delay_between_requests: float,
+    use_json_format: bool,
+    prompt_index: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]],
+    concurrency: int,
+    cache: Optional[LLMCache],
+    semantic_caches: Optional[SemanticCacheSet],
+    embedding_model: str,
+    on_result: Callable[[Dict[str, Any]], None],
+    store_raw: bool = False
+) -> None:
+    """Run every prompt file on one event loop, at most `concurrency` requests at a time.
+
+    Each finished result is passed to `on_result` as it completes, so it
+    survives an interruption of the loop.
+    """
+    client = AsyncClient()
+    # Requests in flight against the server (each followed by the delay)
+    request_slots = asyncio.Semaphore(concurrency)
+    # Prompts being worked on; the slack over `concurrency` lets prompts in a
+    # retry pause wait without idling the server, while keeping the
+    # rest of the batch from being read in up front
+    active = asyncio.Semaphore(2 * concurrency)
+    # Content hash -> first prompt file sent with that content
+    dispatched: Dict[bytes, asyncio.Future] = {}
+    total = len(files_to_process)
+
+    async def bounded(prompt_number: int, prompt_file: Path) -> None:
+        async with active:
+            result = await _process_prompt_file(
+                client, prompt_file, prompt_number, total, responses_dir,
+                model, use_json_format, prompt_index, cache,
+                semantic_caches, embedding_model, request_slots, dispatched,
+                delay_between_requests, store_raw)
+            on_result(result)
+
+    await asyncio.gather(*(bounded(i, prompt_file)
+                           for i, prompt_file in enumerate(files_to_process, 1)))
+
+
 def process_prompts_with_ollama(
     prompts_dir: Path,
     responses_dir: Path,
     model: str = "gpt-oss:latest",
     delay_between_requests: float = 1.0,
     use_json_format: bool = False,
-    prompt_files: Optional[List[Path]] = None
+    prompt_files: Optional[List[Path]] = None,
+    prompt_index: Optional[Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]]] = None,
+    concurrency: Optional[int] = None,
+    enable_cache: bool = True,
+    cache_dir: Optional[Path] = None,
+    semantic_cache: bool = False,
+    semantic_threshold: float = DEFAULT_SEMANTIC_THRESHOLD,
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+    results_path: Optional[Path] = None,
+    store_raw: bool = False
 ) -> List[Dict[str, Any]]:
     """
     Process all prompt files in a directory with Ollama.
 
+    Prompts are sent concurrently through a shared AsyncClient, so network
+    waits and inference overlap instead of running one after another. The
+    server must allow that many parallel requests (OLLAMA_NUM_PARALLEL) for
+    the extra concurrency to pay off.
+
     Args:
         prompts_dir: Directory containing prompt .md files
         responses_dir: Directory to save responses
         model: Ollama model to use
-        delay_between_requests: Delay in seconds between requests
+        delay_between_requests: Seconds a request slot stays taken after each
+                                request that reached Ollama, so every slot
+                                sends at most one request per delay
         use_json_format: Whether to force JSON format in Ollama options
         prompt_files: Optional list of specific prompt files to process.
                      If None, processes all .md files in prompts_dir
+        prompt_index: Optional {prompt filename: (nuc, condition, hechos)} mapping
+                      saved when the prompts were generated. Prompts missing
+                      from it have their values parsed from the prompt text
+        concurrency: Maximum number of prompts in flight. Defaults to
+                     default_concurrency()
+        enable_cache: Whether to reuse cached answers for identical
+                      model + prompt requests (see LLMCache)
+        cache_dir: Cache location. Defaults to responses_dir / ".cache"
+        semantic_cache: Whether to answer prompts whose record embedding is
+                        close to an already answered one (cosine similarity
+                        >= semantic_threshold) without calling the chat model
+        semantic_threshold: Minimum cosine similarity for a semantic hit
+        embedding_model: Ollama model used to embed the record JSON
+        results_path: Optional NDJSON file that receives each result as soon
+                      as it completes (one JSON object per line, in
+                      completion order). It is rewritten on every run and
+                      can be summarized with iter_results. Results are then
+                      not kept in memory and an empty list is returned
+        store_raw: Whether saved results keep the unparsed model output
+                   under 'raw_content'
 
     Returns:
-        List of results for each processed prompt
+        List of results for each processed prompt, in prompt order; empty
+        when results_path is given
     """
     if not prompts_dir.exists():
         raise FileNotFoundError(f"Prompts directory not found: {prompts_dir}")
@@ -300,170 +848,168 @@ def process_prompts_with_ollama(
         # Use the provided list of files
         files_to_process = prompt_files
     else:
-        # Get all .md files in prompts directory
-        files_to_process = list(prompts_dir.glob("*.md"))
+        # Get all .md files in prompts directory; DirEntry.is_file() uses the
+        # file type returned by readdir, so no stat per file is needed
+        with os.scandir(prompts_dir) as entries:
+            files_to_process = [Path(entry.path) for entry in entries
+                                if entry.name.endswith('.md') and entry.is_file()]
 
     files_to_process.sort()  # Process in consistent order
 
-    results = []
-
-    print(
-        f"Processing {len(files_to_process)} prompt files with model {model}")
-    if use_json_format:
-        print(f"Using JSON format enforcement (may cause issues with some models)")
-
-    try:
-        for i, prompt_file in enumerate(files_to_process, 1):
-            print(
-                f"Processing prompt {i}/{len(files_to_process)}: {prompt_file.name}")
-
-            # Read the prompt once
-            prompt_content = prompt_file.read_text(encoding='utf-8')
-
-            # Initialize retry variables
-            max_retries = 3
-            attempt = 0
-            final_result = None
-
-            while attempt < max_retries:
-                attempt += 1
-                print(f"  Attempt {attempt}/{max_retries}")
-
-                try:
-                    # Send to Ollama
-                    result = send_prompt_to_ollama(
-                        prompt_content,
-                        model,
-                        use_json_format=use_json_format
-                    )
-
-                    # Check if we need to retry
-                    if should_retry_result(result):
-                        if attempt < max_retries:
-                            retry_reason = get_retry_reason(result)
-                            print(
-                                f"  ⚠️  Retry needed (reason: {retry_reason}), waiting before retry...")
-                            time.sleep(2)  # Brief pause before retry
-                            continue
-                        else:
-                            print(
-                                f"  ✗ Max retries ({max_retries}) reached, using final result")
-                            final_result = result
-                            break
-                    else:
-                        # Success - no retry needed
-                        final_result = result
-                        if attempt > 1:
-                            print(f"  ✓ Success on attempt {attempt}")
-                        break
-
-                except Exception as e:
-                    if attempt < max_retries:
-                        print(
-                            f"  ✗ Attempt {attempt} failed: {e}, retrying...")
-                        time.sleep(2)  # Brief pause before retry
-                        continue
-                    else:
-                        print(
-                            f"  ✗ Max retries ({max_retries}) reached after exception: {e}")
-                        final_result = {
-                            'success': False,
-                            'prompt_file': prompt_file.name,
-                            'prompt_number': i,
-                            'error': f"Failed after {max_retries} attempts: {str(e)}",
-                            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-                            'retry_attempts': attempt
-                        }
-                        break
-
-            # Use the final result (either successful or after max retries)
-            result = final_result
-
-            # Add file information to result
-            result['prompt_file'] = prompt_file.name
-            result['prompt_number'] = i
-            result['retry_attempts'] = attempt
-
-            # Extract and add original NUC, condition, and hechos values immediately
-            if result.get('success', False):
-                try:
-                    original_nuc, original_condition, original_hechos = extract_original_values_from_prompt(
-                        prompt_content)
-                    if original_nuc:
-                        result['response']['nuc'] = original_nuc
-                        print(f"  ✓ Added NUC: {original_nuc}")
-                    if original_condition:
-                        result['response']['condition'] = original_condition
-                        print(f"  ✓ Added condition")
-                    if original_hechos:
-                        result['response']['hechos'] = original_hechos
-                        print(f"  ✓ Added hechos")
-                except Exception as e:
-                    print(
-                        f"  ⚠️  Warning: Could not extract original values: {e}")
-
-            # Create response filename (replace .md with _response.json)
-            response_filename = prompt_file.stem + "_response.json"
-            response_path = responses_dir / response_filename
+    if concurrency is None:
+        concurrency = default_concurrency()
 
-            # Save the full result as JSON
-            with response_path.open('w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+    cache_dir = cache_dir or responses_dir / ".cache"
+    cache = None
+    if enable_cache:
+        cache = LLMCache(cache_dir)
 
-            print(f"  ✓ Response saved to: {response_filename}")
+    semantic = None
+    if semantic_cache:
+        semantic = SemanticCacheSet(cache_dir / "semantic", semantic_threshold)
 
-            if result['success']:
-                print(f"  ✓ Duration: {result['duration_seconds']:.2f}s")
-                if result.get('used_json_format'):
-                    print(f"  ✓ Used JSON format enforcement")
-                if attempt > 1:
-                    print(f"  ✓ Completed after {attempt} attempts")
-            else:
-                print(f"  ✗ Error: {result['error']}")
+    results = []
+    completed = 0
+    results_file = results_path.open('wb') if results_path is not None else None
 
+    def on_result(result: Dict[str, Any]) -> None:
+        nonlocal completed
+        completed += 1
+        if results_file is None:
             results.append(result)
+        else:
+            # Streamed results are not kept, so memory does not grow with
+            # the batch
+            results_file.write(orjson.dumps(result) + b'\n')
+            results_file.flush()
 
-            # Add delay between requests (except for the last one)
-            if i < len(files_to_process):
-                time.sleep(delay_between_requests)
+    print(
+        f"Processing {len(files_to_process)} prompt files with model {model} "
+        f"({concurrency} concurrent requests)")
+    if use_json_format:
+        print(f"Using JSON format enforcement (may cause issues with some models)")
 
+    try:
+        asyncio.run(_process_prompts_async(
+            files_to_process,
+            responses_dir,
+            model,
+            delay_between_requests,
+            use_json_format,
+            prompt_index or {},
+            concurrency,
+            cache,
+            semantic,
+            embedding_model,
+            on_result,
+            store_raw
+        ))
     except KeyboardInterrupt:
         print(
-            f"\n⚠️  Processing interrupted by user after {len(results)} prompts")
+            f"\n⚠️  Processing interrupted by user after {completed} prompts")
         print(f"   Partial results will be saved")
+    finally:
+        if results_file is not None:
+            results_file.close()
+        if semantic is not None:
+            semantic.save()
+
+    if cache is not None:
+        stats = cache.stats()
+        print(
+            f"Response cache: {stats['hits']} hits, {stats['misses']} misses")
+    if semantic is not None:
+        stats = semantic.stats()
+        print(
+            f"Semantic cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"(threshold {stats['threshold']})")
+
+    results.sort(key=lambda r: r['prompt_number'])
+    return results
+
+
+def iter_results(results_path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield the results written to an NDJSON file by process_prompts_with_ollama."""
+    with results_path.open('rb') as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
 
 
 def save_summary_report(
-    results: List[Dict[str, Any]],
-    output_path: Path
+    results: Iterable[Dict[str, Any]],
+    output_path: Path,
+    semantic_threshold: Optional[float] = None,
+    results_path: Optional[Path] = None
 ) -> None:
     """
     Save a summary report of all Ollama processing results.
 
+    The results are aggregated in a single pass, so they can be streamed
+    with iter_results instead of being held in memory.
+
     Args:
-        results: List of result dictionaries from process_prompts_with_ollama
+        results: Result dictionaries from process_prompts_with_ollama, or
+                 iter_results(results_path)
         output_path: Path to save the summary report
+        semantic_threshold: Similarity threshold of the semantic cache, when it
+                            was enabled; adds semantic cache statistics
+        results_path: NDJSON file holding the detailed results. When given,
+                      the summary references it instead of embedding every
+                      result under 'detailed_results'
     """
-    successful = [r for r in results if r.get('success', False)]
-    failed = [r for r in results if not r.get('success', False)]
-
-    total_duration = sum(r.get('duration_seconds', 0) for r in successful)
-    avg_duration = total_duration / len(successful) if successful else 0
+    total = 0
+    successful = 0
+    total_duration = 0.0
+    total_retry_attempts = 0
+    max_retry_attempts = 1
+    prompts_with_retries = 0
+    # Responses replayed from the LLM cache
+    cached_responses = 0
+    semantic_hits = 0
+    # Results reused from a byte-identical prompt of the same run
+    duplicate_prompts = 0
+    failed = []
+    detailed_results = [] if results_path is None else None
+
+    for r in results:
+        total += 1
+        retry_attempts = r.get('retry_attempts', 1)
+        if 'duplicate_of' in r:
+            # Never sent (retry_attempts is 0): left out of the retry statistics
+            duplicate_prompts += 1
+        else:
+            total_retry_attempts += retry_attempts
+            max_retry_attempts = max(max_retry_attempts, retry_attempts)
+            if retry_attempts > 1:
+                prompts_with_retries += 1
+        if r.get('cached', False):
+            cached_responses += 1
+        if 'semantic_similarity' in r:
+            semantic_hits += 1
+        if r.get('success', False):
+            successful += 1
+            total_duration += r.get('duration_seconds', 0)
+        else:
+            failed.append({
+                'file': r.get('prompt_file'),
+                'error': r.get('error'),
+                'retry_attempts': retry_attempts
+            })
+        if detailed_results is not None:
+            detailed_results.append(r)
 
-    # Calculate retry statistics
-    total_retry_attempts = sum(r.get('retry_attempts', 1) for r in results)
-    avg_retry_attempts = total_retry_attempts / len(results) if results else 0
-    max_retry_attempts = max((r.get('retry_attempts', 1)
-                             for r in results), default=1)
-    prompts_with_retries = len(
-        [r for r in results if r.get('retry_attempts', 1) > 1])
+    avg_duration = total_duration / successful if successful else 0
+    # Prompts that went through _request_with_retries
+    requested = total - duplicate_prompts
+    avg_retry_attempts = total_retry_attempts / requested if requested else 0
 
     summary = {
         'processing_summary': {
-            'total_prompts': len(results),
-            'successful': len(successful),
+            'total_prompts': total,
+            'successful': successful,
             'failed': len(failed),
-            'success_rate': len(successful) / len(results) if results else 0,
+            'success_rate': successful / total if total else 0,
             'total_duration_seconds': total_duration,
             'average_duration_seconds': avg_duration,
             'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
@@ -472,28 +1018,39 @@ def save_summary_report(
                 'average_retry_attempts': avg_retry_attempts,
                 'max_retry_attempts': max_retry_attempts,
                 'prompts_with_retries': prompts_with_retries,
-                'retry_rate': prompts_with_retries / len(results) if results else 0
+                'retry_rate': prompts_with_retries / requested if requested else 0
+            },
+            'cache_statistics': {
+                'cached_responses': cached_responses,
+                'cache_hit_rate': cached_responses / total if total else 0
+            },
+            'duplicate_statistics': {
+                'duplicate_prompts': duplicate_prompts,
+                'duplicate_rate': duplicate_prompts / total if total else 0
             }
         },
-        'failed_prompts': [
-            {
-                'file': r.get('prompt_file'),
-                'error': r.get('error'),
-                'retry_attempts': r.get('retry_attempts', 1)
-            }
-            for r in failed
-        ],
-        'detailed_results': results
+        'failed_prompts': failed
     }
 
-    with output_path.open('w', encoding='utf-8') as f:
-        json.dump(summary, f, ensure_ascii=False, indent=2)
+    if semantic_threshold is not None:
+        summary['processing_summary']['cache_statistics']['semantic'] = {
+            'threshold': semantic_threshold,
+            'hits': semantic_hits,
+            'hit_rate': semantic_hits / total if total else 0
+        }
+
+    if results_path is not None:
+        summary['results_file'] = str(results_path)
+    else:
+        summary['detailed_results'] = detailed_results
+
+    output_path.write_bytes(orjson.dumps(summary, option=_JSON_DUMP_OPTIONS))
 
     print(f"\nProcessing Summary:")
-    print(f"  Total prompts: {len(results)}")
-    print(f"  Successful: {len(successful)}")
+    print(f"  Total prompts: {total}")
+    print(f"  Successful: {successful}")
     print(f"  Failed: {len(failed)}")
-    print(f"  Success rate: {len(successful) / len(results) * 100:.1f}%")
+    print(f"  Success rate: {successful / total * 100:.1f}%" if total else "  Success rate: 0%")
     if successful:
         print(f"  Total duration: {total_duration:.2f}s")
         print(f"  Average duration: {avg_duration:.2f}s")
@@ -503,5 +1060,12 @@ def save_summary_report(
     print(f"    Max retry attempts: {max_retry_attempts}")
     print(f"    Prompts with retries: {prompts_with_retries}")
     print(
-        f"    Retry rate: {prompts_with_retries / len(results) * 100:.1f}%" if results else "    Retry rate: 0%")
+        f"    Retry rate: {prompts_with_retries / requested * 100:.1f}%" if requested else "    Retry rate: 0%")
+    print(f"  Cached responses: {cached_responses}")
+    print(f"  Duplicate prompts: {duplicate_prompts}")
+    if semantic_threshold is not None:
+        print(
+            f"  Semantic cache hits: {semantic_hits} (threshold {semantic_threshold})")
+    if results_path is not None:
+        print(f"  Detailed results: {results_path}")
     print(f"  Summary saved to: {output_path}")
@@ -1,17 +1,46 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
-import json
+from typing import Dict, Any, Iterable
 import re
 
+import orjson
+
 
 CONDITION_PLACEHOLDER = "{{CONDITION}}"
 JSON_PLACEHOLDER = "{{RECORD_JSON}}"
 OUTPUT_SCHEMA_PLACEHOLDER = "{{OUTPUT_SCHEMA}}"
 
+# The condition of a rendered prompt runs from its label to the next section
+# heading; it may span several paragraphs
+CONDITION_LABEL = "Condición:"
+_CONDITION_ENDS = ("\nDatos", "\nResponde")
+
+# Index of the values each prompt was built from, written next to the prompts
+PROMPT_INDEX_NAME = "_index.json"
+
+# Record fields holding the case identifier and the narration, in priority order
+NUC_FIELDS = ('nuc', 'NUC', 'case_id', 'id', 'folio', 'numero_unico_caso')
+HECHOS_FIELDS = ('hechos', 'Hechos', 'HECHOS',
+                 'narrativa', 'narracion', 'crime_narration')
+
+# Characters dropped from prompt filenames: \w is exactly str.isalnum() plus
+# "_", so Unicode letters and digits are kept as before
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w-]")
+
+# Pretty JSON for records and the output schema, formatted like
+# json.dumps(ensure_ascii=False, indent=2); numpy values from pandas
+# records are serialized natively
+_JSON_RENDER_OPTIONS = (orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+                        | orjson.OPT_NON_STR_KEYS)
+
+# A code fence block containing the record placeholder
+_FENCED_PLACEHOLDER_RE = re.compile(
+    r"```[^`]*?" + re.escape(JSON_PLACEHOLDER) + r"[^`]*?```", re.DOTALL)
+
 
 def load_config(path: Path) -> dict:
-    with path.open('r', encoding='utf-8') as f:
-        return json.load(f)
+    return orjson.loads(path.read_bytes())
 
 
 def load_condition(path: Path) -> str:
@@ -30,65 +59,164 @@ def _ensure_json_fence(pre_template: str, json_snippet: str) -> str:
       - Replace the placeholder token (which is already inside fences in the
         template) OR if the template only had the placeholder, insert fences.
     """
+    # Nothing to fence (render_record has usually replaced the placeholder
+    # already); skip the DOTALL scan over the whole prompt
+    if JSON_PLACEHOLDER not in pre_template:
+        return pre_template
+
     fenced_json = f"```json\n{json_snippet}\n```"
 
     # Case 1: Placeholder inside existing triple backticks block:
     # Replace any code fence block containing only the placeholder.
-    pattern = re.compile(
-        r"```[^`]*?" + re.escape(JSON_PLACEHOLDER) + r"[^`]*?```", re.DOTALL)
-    if pattern.search(pre_template):
-        return pattern.sub(fenced_json, pre_template, count=1)
+    if _FENCED_PLACEHOLDER_RE.search(pre_template):
+        return _FENCED_PLACEHOLDER_RE.sub(fenced_json, pre_template, count=1)
 
     # Case 2: Placeholder bare; just replace token with fenced block.
     return pre_template.replace(JSON_PLACEHOLDER, fenced_json)
 
 
-def render_prompt(template: str, condition: str, record: Dict[str, Any], output_schema: Dict[str, Any] = None) -> str:
-    # Convert record to a pretty JSON string (ensure_ascii False preserves accents)
-    record_json = json.dumps(record, ensure_ascii=False, indent=2)
-
+def prepare_template(template: str, condition: str, output_schema: Dict[str, Any] = None) -> str:
+    """Substitute the parts of the template shared by every record of a batch."""
     out = template.replace(CONDITION_PLACEHOLDER, condition)
 
     # Replace output schema placeholder if present
     if output_schema:
-        schema_json = json.dumps(output_schema, ensure_ascii=False, indent=2)
+        schema_json = orjson.dumps(
+            output_schema, option=_JSON_RENDER_OPTIONS).decode()
         out = out.replace(OUTPUT_SCHEMA_PLACEHOLDER,
                           f"```json\n{schema_json}\n```")
+    return out
+
+
+def render_record(base_template: str, record: Dict[str, Any]) -> str:
+    """Render one record into a template returned by prepare_template."""
+    # Convert record to a pretty JSON string (non-ASCII characters are kept as is)
+    record_json = orjson.dumps(record, option=_JSON_RENDER_OPTIONS).decode()
 
     # Replace JSON placeholder, ensuring fenced block has language spec
-    out = out.replace(JSON_PLACEHOLDER, record_json)
+    out = base_template.replace(JSON_PLACEHOLDER, record_json)
     # Upgrade fence to json if not already
     out = _ensure_json_fence(out, record_json)
     return out
 
 
+def render_prompt(template: str, condition: str, record: Dict[str, Any], output_schema: Dict[str, Any] = None) -> str:
+    return render_record(prepare_template(template, condition, output_schema), record)
+
+
 def safe_filename(nuc_val: Any, index: int) -> str:
     base = str(nuc_val).strip() if nuc_val not in (
         None, "", "nan") else f"row_{index + 1}"
     # Keep only safe chars
-    safe = "".join(ch for ch in base if ch.isalnum() or ch in ("-", "_"))
+    safe = _UNSAFE_FILENAME_CHARS.sub("", base)
     if not safe:
         safe = f"row_{index + 1}"
     return f"prompt_{safe}.md"
 
 
+def _first_field(record: Dict[str, Any], fields: tuple[str, ...]) -> str | None:
+    for field in fields:
+        value = record.get(field)
+        if value is not None:
+            return str(value)
+    return None
+
+
+def extract_condition(prompt_content: str) -> str | None:
+    """Return the condition block of a prompt, or None if it has none.
+
+    This is the condition every later step reports, whether it comes from
+    the prompt index or is read back from the prompt file.
+    """
+    label_pos = prompt_content.find(CONDITION_LABEL)
+    if label_pos < 0:
+        return None
+    start = label_pos + len(CONDITION_LABEL)
+    ends = [pos for pos in (prompt_content.find(end, start)
+                            for end in _CONDITION_ENDS) if pos >= 0]
+    if not ends:
+        return None
+    return prompt_content[start:min(ends)].strip() or None
+
+
+def load_prompt_index(prompts_dir: Path) -> dict[str, tuple[str | None, str | None, str | None]]:
+    """Load the prompt index as {prompt filename: (nuc, condition, hechos)}.
+
+    Returns an empty dict when the prompts were generated without an index.
+    """
+    index_path = prompts_dir / PROMPT_INDEX_NAME
+    if not index_path.exists():
+        return {}
+    index = orjson.loads(index_path.read_bytes())
+    condition = index.get('condition')
+    return {
+        name: (entry.get('nuc'), condition, entry.get('hechos'))
+        for name, entry in index.get('prompts', {}).items()
+    }
+
+
 def write_prompts(
-    records: list[dict[str, Any]],
+    records: Iterable[dict[str, Any]],
     config_path: Path,
     output_dir: Path,
     nuc_column: str | None = None,
+    index_path: Path | None = None,
+    max_workers: int = 8,
 ) -> list[Path]:
+    """Render one prompt file per record.
+
+    Rendering and writing run on a thread pool. At most a few batches of
+    records are pending at a time, so `records` is still consumed as a
+    stream, and files that share a name are written in record order, so the
+    last record wins as before.
+
+    When `index_path` is given, the NUC and Hechos of every prompt (and the
+    batch condition) are also saved there, so later steps can recover them
+    without parsing the prompt files back.
+    """
     config = load_config(config_path)
-    template = config['prompt_template']
     condition = config['condition']
-    output_schema = config.get('output_schema')
+    # Condition and schema are the same for every record: substitute them once
+    base_template = prepare_template(
+        config['prompt_template'], condition, config.get('output_schema'))
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    written: list[Path] = []
-    for idx, rec in enumerate(records):
-        nuc_val = rec.get(nuc_column) if nuc_column else None
-        content = render_prompt(template, condition, rec, output_schema)
-        file_path = output_dir / safe_filename(nuc_val, idx)
+    def render_and_write(file_path: Path, rec: dict[str, Any]) -> None:
+        content = render_record(base_template, rec)
         file_path.write_text(content, encoding="utf-8")
-        written.append(file_path)
+
+    written: list[Path] = []
+    index_entries: dict[str, dict[str, str | None]] = {}
+    pending: deque[Future] = deque()
+    latest_by_name: dict[str, Future] = {}
+    window = 4 * max_workers
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for idx, rec in enumerate(records):
+            nuc_val = rec.get(nuc_column) if nuc_column else None
+            file_path = output_dir / safe_filename(nuc_val, idx)
+            earlier = latest_by_name.get(file_path.name)
+            if earlier is not None:
+                # Same file as an earlier record: let that write finish first
+                earlier.result()
+            future = executor.submit(render_and_write, file_path, rec)
+            latest_by_name[file_path.name] = future
+            pending.append(future)
+            if len(pending) > window:
+                # Surfaces write errors and bounds the records held in memory
+                pending.popleft().result()
+            written.append(file_path)
+            if index_path is not None:
+                index_entries[file_path.name] = {
+                    'nuc': _first_field(rec, NUC_FIELDS),
+                    'hechos': _first_field(rec, HECHOS_FIELDS),
+                }
+        for future in pending:
+            future.result()
+
+    if index_path is not None:
+        # Same text the prompt files yield when read back
+        indexed_condition = extract_condition(base_template) or condition.strip()
+        index = {'condition': indexed_condition, 'prompts': index_entries}
+        index_path.write_bytes(orjson.dumps(
+            index, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
     return written
@@ -0,0 +1,48 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import orjson
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+from utils import ollama_client  # noqa: E402
+from utils.prompt_builder import (  # noqa: E402
+    PROMPT_INDEX_NAME,
+    load_prompt_index,
+    write_prompts,
+)
+
+_spec = importlib.util.spec_from_file_location(
+    "create_summary", SRC / "3_create_summary.py")
+create_summary = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(create_summary)
+
+TEMPLATE = (
+    "Condición: {{CONDITION}}\n\n"
+    "Datos del caso:\n\n```json\n{{RECORD_JSON}}\n```\n\n"
+    "Responde solo con JSON:\n\n{{OUTPUT_SCHEMA}}\n"
+)
+CONDITION = "Primer párrafo.\n\nSegundo párrafo.\n\nTercer párrafo."
+
+
+def test_fallbacks_match_indexed_condition(tmp_path):
+    config_path = tmp_path / "prompt_config.json"
+    config_path.write_bytes(orjson.dumps({
+        "prompt_template": TEMPLATE,
+        "condition": CONDITION,
+        "output_schema": {"meets_condition": "boolean"},
+    }))
+    prompts_dir = tmp_path / "prompts"
+    write_prompts([{"NUC": "A1", "Hechos": "x"}], config_path, prompts_dir,
+                  nuc_column="NUC", index_path=prompts_dir / PROMPT_INDEX_NAME)
+
+    prompt_path = prompts_dir / "prompt_A1.md"
+    indexed = load_prompt_index(prompts_dir)["prompt_A1.md"][1]
+    parsed = ollama_client.extract_original_values_from_prompt(
+        prompt_path.read_text(encoding="utf-8"))[1]
+
+    assert indexed == CONDITION
+    assert parsed == indexed
+    assert create_summary.extract_condition_from_prompt(prompt_path) == indexed
@@ -0,0 +1,28 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import orjson
+import pandas as pd
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+_spec = importlib.util.spec_from_file_location(
+    "generate_prompts", SRC / "1_generate_prompts.py")
+generate_prompts = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(generate_prompts)
+
+
+def test_mixed_str_int_date_column_is_json_serializable(tmp_path):
+    excel_path = tmp_path / "mixed.xlsx"
+    pd.DataFrame({
+        "NUC": ["A", "B", "C"],
+        "Dato": [" texto ", 7, pd.Timestamp("2024-01-02 03:04:05")],
+    }).to_excel(excel_path, index=False)
+
+    df, _ = generate_prompts.read_excel_frame(excel_path)
+    records = generate_prompts.frame_to_records(df)
+
+    assert [r["Dato"] for r in records] == ["texto", 7, "2024-01-02T03:04:05"]
+    orjson.dumps(records)